@@ -66,11 +66,21 @@ DATABASES = {
     'default': dj_database_url.config(
         default='sqlite:///db.sqlite3',  # fallback for local/CI
         conn_max_age=600,
-        ssl_require=True
+        ssl_require=bool(config('DATABASE_URL', default=''))  # sqlite rejects sslmode
     )
 }
 
-
+# Cache (must be shared between workers). The dummy default turns caching,
+# including the per-user ticket wallet, off rather than letting each gunicorn
+# worker keep its own stale copy. For Redis set
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and
+# CACHE_LOCATION=redis://host:6379/0.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.dummy.DummyCache'),
+        'LOCATION': config('CACHE_LOCATION', default='nfps-events'),
+    }
+}
 
 
 # Password validation
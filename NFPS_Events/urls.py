@@ -30,9 +30,11 @@ urlpatterns = [
     path('login-success/', views.login_success, name='login_success'),
     path('logout/', views.custom_logout, name='logout'),
     path('dashboard/', views.user_dashboard, name='user_dashboard'),
+    path('dashboard/wallet/', views.user_wallet, name='user_wallet'),
     path('event/<int:pk>/', views.event_detail, name='event_detail'),
     path('event/<int:pk>/register/', views.register_event, name='register_event'),
     path('event/<int:pk>/payment/', views.payment_page, name='payment_page'),
+    path('event/<int:pk>/seats/', views.event_seat_map, name='event_seat_map'),
     path('ticket/<str:tracking_code>/', views.ticket_view, name='ticket_view'),
 
     # Admin access (specific first, general last)
@@ -1,8 +1,64 @@
-from django.contrib import admin
-from .models import Event, Registration
+from django.contrib import admin, messages
+from django.db import transaction
+from django.http import HttpResponseRedirect
+from django.urls import reverse
+from django.utils import timezone
+
+from .forms import SeatRowForm, SeatRowFormSet
+from .models import Event, Registration, SeatRow, BookingLog
+from . import seating, wallet
+
+class SeatRowInline(admin.TabularInline):
+    model = SeatRow
+    form = SeatRowForm
+    formset = SeatRowFormSet
+    fields = ('section', 'label', 'seat_count', 'first_seat_number', 'price', 'rank')
+    extra = 0
 
 class EventAdmin(admin.ModelAdmin):
-    list_display = ('title', 'venue', 'date_time', 'total_seats', 'remaining_seats', 'booked_seats')
+    list_display = ('title', 'venue', 'date_time', 'total_seats', 'remaining_seats', 'booked_seats', 'cancelled_at')
+    list_filter = ('cancelled_at',)
+    inlines = [SeatRowInline]
+    actions = ['cancel_selected']
+
+    # Deleting only cancels the event; purge_cancelled_events removes it and
+    # its registrations in batches later, as admin_delete_event does.
+    def delete_model(self, request, obj):
+        if obj.cancelled_at is None:
+            obj.cancelled_at = timezone.now()
+            obj.save(update_fields=['cancelled_at'])
+
+    def delete_queryset(self, request, queryset):
+        if queryset.filter(cancelled_at__isnull=True).update(cancelled_at=timezone.now()):
+            wallet.events_changed()
+
+    def response_delete(self, request, obj_display, obj_id):
+        self.message_user(
+            request,
+            f"“{obj_display}” was cancelled. Its registrations will be removed in the background.",
+            messages.WARNING,
+        )
+        return HttpResponseRedirect(reverse('admin:events_event_changelist'))
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    @admin.action(permissions=['delete'], description="Cancel selected events")
+    def cancel_selected(self, request, queryset):
+        count = queryset.filter(cancelled_at__isnull=True).count()
+        self.delete_queryset(request, queryset)
+        self.message_user(
+            request,
+            f"Cancelled {count} event(s). Their registrations will be removed in the background.",
+            messages.WARNING,
+        )
+
+    def get_deleted_objects(self, objs, request):
+        # Skip collecting every registration for the confirmation page.
+        objs = list(objs)
+        return [str(obj) for obj in objs], {Event._meta.verbose_name_plural: len(objs)}, set(), []
 
     def booked_seats(self, obj):
         return obj.booked_seats()
@@ -12,6 +68,39 @@ class RegistrationAdmin(admin.ModelAdmin):
     list_display = ('user', 'event', 'tickets_booked', 'tracking_code', 'status', 'registered_at')
     list_filter = ('event', 'user')
     search_fields = ('user__username', 'event__title')
+    readonly_fields = ('seat_row', 'seat_start')
+
+    def get_readonly_fields(self, request, obj=None):
+        # The claimed block in SeatRow.taken belongs to this event and user and
+        # is sized by tickets_booked.
+        if obj is not None and obj.seat_row_id is not None:
+            return self.readonly_fields + ('event', 'user', 'tickets_booked')
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            old = Registration.objects.select_for_update().get(pk=obj.pk) if change else None
+            super().save_model(request, obj, form, change)
+            if old is None:
+                BookingLog.record(BookingLog.CREATED, obj)
+            else:
+                BookingLog.record_change(old, obj)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            seating.release_seats(obj)
+            BookingLog.record(BookingLog.REMOVED, obj)
+            super().delete_model(request, obj)
+        wallet.invalidate(obj.user_id)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            registrations = list(queryset.select_for_update())
+            for reg in registrations:
+                seating.release_seats(reg)
+            BookingLog.objects.bulk_create([BookingLog.entry(BookingLog.REMOVED, reg) for reg in registrations])
+            super().delete_queryset(request, queryset)
+        wallet.invalidate(*{reg.user_id for reg in registrations})
 
 admin.site.register(Event, EventAdmin)
 admin.site.register(Registration, RegistrationAdmin)
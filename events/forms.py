@@ -1,5 +1,6 @@
 from django import forms
-from .models import Event, PaymentMethod
+from django.forms.models import BaseInlineFormSet
+from .models import Event, PaymentMethod, SeatRow
 
 class EventForm(forms.ModelForm):
     class Meta:
@@ -14,3 +15,32 @@ class PaymentMethodForm(forms.ModelForm):
     class Meta:
         model = PaymentMethod
         fields = ['method', 'number', 'is_active']
+
+class SeatRowForm(forms.ModelForm):
+    class Meta:
+        model = SeatRow
+        fields = ['section', 'label', 'seat_count', 'first_seat_number', 'price', 'rank']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.instance.pk is None:
+            return cleaned_data
+
+        # Seats already claimed must stay inside the row.
+        claimed = self.instance.taken_mask
+        seat_count = cleaned_data.get('seat_count')
+        if seat_count is not None and seat_count < claimed.bit_length():
+            raise forms.ValidationError(
+                f"Seat {claimed.bit_length()} in this row is claimed; the row needs at least that many seats."
+            )
+        return cleaned_data
+
+class SeatRowFormSet(BaseInlineFormSet):
+    def clean(self):
+        super().clean()
+        # Forms marked for deletion skip their own clean(), so check them here.
+        for form in self.deleted_forms:
+            if form.instance.pk is not None and form.instance.taken_mask:
+                raise forms.ValidationError(
+                    f"Row {form.instance.label} in {form.instance.section} has claimed seats and cannot be deleted."
+                )
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from events.models import Event, Registration, BookingLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the registrations of cancelled events in small batches, then the events themselves. "
+        "Safe to interrupt: rerunning picks up where the last run stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', type=int, help="Only purge this cancelled event.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Registrations deleted per transaction (default: 1000).")
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help="Seconds to sleep between batches to leave room for live traffic.")
+
+    def handle(self, *args, **options):
+        events = Event.objects.filter(cancelled_at__isnull=False).order_by('cancelled_at')
+        if options['event'] is not None:
+            events = events.filter(pk=options['event'])
+
+        for event in events:
+            self.purge_event(event, options['batch_size'], options['pause'])
+
+    def purge_event(self, event, batch_size, pause):
+        remaining = Registration.objects.filter(event=event).count()
+        self.stdout.write(f"Purging '{event.title}' (#{event.pk}): {remaining} registrations left")
+
+        deleted = 0
+        while True:
+            # No ordering: the LIMIT stops early on the event_id index, so every
+            # batch is a short delete that only locks the rows it touches.
+            batch = list(
+                Registration.objects.filter(event=event)
+                .order_by()
+                .only('user_id', 'event_id', 'status', 'tickets_booked', 'total_price')[:batch_size]
+            )
+            if not batch:
+                break
+
+            with transaction.atomic():
+                BookingLog.objects.bulk_create([BookingLog.entry(BookingLog.REMOVED, reg) for reg in batch])
+                Registration.objects.filter(pk__in=[reg.pk for reg in batch]).delete()
+
+            deleted += len(batch)
+            self.stdout.write(f"  deleted {deleted}/{remaining}")
+            if pause:
+                time.sleep(pause)
+
+        event_id = event.pk
+        event.delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted '{event.title}' (#{event_id})"))
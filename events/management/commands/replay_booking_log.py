@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events.projections import PROJECTIONS
+
+
+class Command(BaseCommand):
+    help = "Bring booking log projections up to date, or rebuild them from the start of the log."
+
+    def add_arguments(self, parser):
+        parser.add_argument('projections', nargs='*', help=f"Projections to update (default: all of {', '.join(PROJECTIONS)}).")
+        parser.add_argument('--rebuild', action='store_true', help="Drop the saved state and replay the whole log.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Log entries applied per transaction (default: 1000).")
+
+    def handle(self, *args, **options):
+        names = options['projections'] or list(PROJECTIONS)
+        unknown = [name for name in names if name not in PROJECTIONS]
+        if unknown:
+            raise CommandError(f"Unknown projection(s): {', '.join(unknown)}")
+
+        for name in names:
+            projection = PROJECTIONS[name]
+            if options['rebuild']:
+                applied = projection.rebuild(options['batch_size'])
+            else:
+                applied = projection.catch_up(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"{name}: applied {applied} log entries"))
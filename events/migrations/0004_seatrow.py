@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-19 03:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_paymentmethod'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registration',
+            name='seat_start',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SeatRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(max_length=50)),
+                ('label', models.CharField(max_length=10)),
+                ('seat_count', models.PositiveIntegerField()),
+                ('first_seat_number', models.PositiveIntegerField(default=1)),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('rank', models.PositiveIntegerField(default=0, help_text='Lower ranks are offered first.')),
+                ('taken', models.BinaryField(default=b'')),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_rows', to='events.event')),
+            ],
+            options={
+                'ordering': ['rank', 'id'],
+                'unique_together': {('event', 'section', 'label')},
+            },
+        ),
+        migrations.AddField(
+            model_name='registration',
+            name='seat_row',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='events.seatrow'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2 on 2026-10-19 04:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def seed_booking_log(apps, schema_editor):
+    # Give registrations made before the log existed a starting entry so
+    # projections replayed from the beginning match the current tables.
+    Registration = apps.get_model('events', 'Registration')
+    BookingLog = apps.get_model('events', 'BookingLog')
+    entries = []
+    for reg in Registration.objects.order_by('pk').iterator(chunk_size=1000):
+        entries.append(BookingLog(
+            kind=1, registration_id=reg.pk, event_id=reg.event_id, user_id=reg.user_id,
+            status='pending' if reg.status == 'complete' else reg.status,
+            tickets=reg.tickets_booked, amount=reg.total_price, created_at=reg.registered_at,
+        ))
+        if reg.status == 'complete':
+            entries.append(BookingLog(
+                kind=3, registration_id=reg.pk, event_id=reg.event_id, user_id=reg.user_id,
+                status='pending', tickets=reg.tickets_booked, amount=reg.total_price,
+                created_at=reg.registered_at,
+            ))
+        if len(entries) >= 1000:
+            BookingLog.objects.bulk_create(entries)
+            entries = []
+    BookingLog.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_event_cancelled_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.BigIntegerField(default=0)),
+                ('gaps', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProjectionState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('projection', models.CharField(max_length=50)),
+                ('key', models.CharField(max_length=50)),
+                ('value', models.JSONField(default=dict)),
+            ],
+            options={
+                'unique_together': {('projection', 'key')},
+            },
+        ),
+        migrations.CreateModel(
+            name='BookingLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Created'), (2, 'Tickets added'), (3, 'Approved'), (4, 'Rejected'), (5, 'Removed')])),
+                ('registration_id', models.BigIntegerField()),
+                ('event_id', models.BigIntegerField()),
+                ('user_id', models.BigIntegerField()),
+                ('status', models.CharField(max_length=10)),
+                ('tickets', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['event_id', 'created_at'], name='events_book_event_i_e97fbd_idx'), models.Index(fields=['created_at'], name='events_book_created_81bd44_idx')],
+            },
+        ),
+        migrations.RunPython(seed_booking_log, migrations.RunPython.noop),
+    ]
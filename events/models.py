@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 import uuid
 
 class Event(models.Model):
@@ -9,9 +10,14 @@ class Event(models.Model):
     date_time = models.DateTimeField()
     total_seats = models.IntegerField()
     ticket_price = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    cancelled_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def is_cancelled(self):
+        return self.cancelled_at is not None
 
     def booked_seats(self):
-        return sum(r.tickets_booked for r in Registration.objects.filter(event=self))
+        return Registration.objects.filter(event=self).aggregate(total=models.Sum('tickets_booked'))['total'] or 0
 
     @property
     def remaining_seats(self):
@@ -46,6 +52,8 @@ class Registration(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
     registered_at = models.DateTimeField(auto_now_add=True)
     tracking_code = models.CharField(max_length=50, unique=True, blank=True, null=True)
+    seat_row = models.ForeignKey('SeatRow', on_delete=models.SET_NULL, null=True, blank=True)
+    seat_start = models.PositiveIntegerField(null=True, blank=True)
 
 
     def __str__(self):
@@ -56,6 +64,12 @@ class Registration(models.Model):
             self.tracking_code = f"TKT-{self.event.id}-{uuid.uuid4().hex[:6].upper()}"
         super().save(*args, **kwargs)
 
+    @property
+    def seat_labels(self):
+        if self.seat_row is None or self.seat_start is None:
+            return ''
+        return self.seat_row.seat_labels(self.seat_start, self.tickets_booked)
+
 
 class PaymentMethod(models.Model):
     METHOD_CHOICES = [
@@ -70,3 +84,172 @@ class PaymentMethod(models.Model):
 
     def __str__(self):
         return f"{self.get_method_display()} - {self.number}"
+
+
+class SeatRow(models.Model):
+    """One row of a reserved-seating map.
+
+    Taken seats are kept as a little-endian bitset (bit ``i`` set means seat
+    ``i`` is claimed), so a whole venue is a handful of rows instead of one
+    database row per seat.
+    """
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='seat_rows')
+    section = models.CharField(max_length=50)
+    label = models.CharField(max_length=10)
+    seat_count = models.PositiveIntegerField()
+    first_seat_number = models.PositiveIntegerField(default=1)
+    price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    rank = models.PositiveIntegerField(default=0, help_text="Lower ranks are offered first.")
+    taken = models.BinaryField(default=b'')
+
+    class Meta:
+        ordering = ['rank', 'id']
+        unique_together = ('event', 'section', 'label')
+
+    def __str__(self):
+        return f"{self.event.title} - {self.section} {self.label}"
+
+    @property
+    def effective_price(self):
+        return self.event.ticket_price if self.price is None else self.price
+
+    @property
+    def full_mask(self):
+        return (1 << self.seat_count) - 1
+
+    @property
+    def taken_mask(self):
+        return int.from_bytes(bytes(self.taken), 'little') & self.full_mask
+
+    @taken_mask.setter
+    def taken_mask(self, value):
+        self.taken = (value & self.full_mask).to_bytes((self.seat_count + 7) // 8, 'little')
+
+    def seat_labels(self, start, count):
+        first = self.first_seat_number + start
+        if count == 1:
+            return f"{self.section}, row {self.label}, seat {first}"
+        return f"{self.section}, row {self.label}, seats {first}-{first + count - 1}"
+
+
+class BookingLogQuerySet(models.QuerySet):
+    def for_event(self, event_id):
+        return self.filter(event_id=event_id)
+
+    def between(self, start=None, end=None):
+        qs = self
+        if start is not None:
+            qs = qs.filter(created_at__gte=start)
+        if end is not None:
+            qs = qs.filter(created_at__lt=end)
+        return qs
+
+
+class BookingLog(models.Model):
+    """Append-only record of registration changes.
+
+    Ids and user/event references are plain integers so history survives
+    deleted registrations and purged events. ``tickets`` and ``amount`` are the
+    quantities the change adds to, moves between or removes from the
+    ``status`` bucket, depending on ``kind``.
+
+    The views, the Django admin, user deletion and purge_cancelled_events all
+    log their changes. Writes that go around them (shell sessions, raw SQL,
+    queryset ``update()``/``delete()``) are not seen by the projections and
+    must log through ``record``/``record_change`` themselves.
+    """
+    CREATED = 1
+    TICKETS_ADDED = 2
+    APPROVED = 3
+    REJECTED = 4
+    REMOVED = 5
+    KIND_CHOICES = [
+        (CREATED, 'Created'),
+        (TICKETS_ADDED, 'Tickets added'),
+        (APPROVED, 'Approved'),
+        (REJECTED, 'Rejected'),
+        (REMOVED, 'Removed'),
+    ]
+
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    registration_id = models.BigIntegerField()
+    event_id = models.BigIntegerField()
+    user_id = models.BigIntegerField()
+    status = models.CharField(max_length=10)
+    tickets = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = BookingLogQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['event_id', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.get_kind_display()} registration {self.registration_id}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Booking log entries are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Booking log entries are append-only.")
+
+    @classmethod
+    def entry(cls, kind, registration, tickets=None, amount=None):
+        return cls(
+            kind=kind,
+            registration_id=registration.id,
+            event_id=registration.event_id,
+            user_id=registration.user_id,
+            status=registration.status,
+            tickets=registration.tickets_booked if tickets is None else tickets,
+            amount=registration.total_price if amount is None else amount,
+        )
+
+    @classmethod
+    def record(cls, kind, registration, tickets=None, amount=None):
+        """Append one entry; call inside the transaction that makes the change."""
+        log = cls.entry(kind, registration, tickets, amount)
+        log.save()
+        return log
+
+    @classmethod
+    def record_change(cls, old, new):
+        """Log an arbitrary edit from ``old`` to ``new`` state of a registration."""
+        fields = ('event_id', 'user_id', 'tickets_booked', 'total_price')
+        same = all(getattr(old, field) == getattr(new, field) for field in fields)
+        if same and old.status == new.status:
+            return []
+        if same and old.status == 'pending' and new.status == 'complete':
+            return [cls.record(cls.APPROVED, old)]
+        # Anything else replays as the old booking leaving and the new one arriving.
+        return cls.objects.bulk_create([cls.entry(cls.REMOVED, old), cls.entry(cls.CREATED, new)])
+
+
+class ProjectionCheckpoint(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    position = models.BigIntegerField(default=0)
+    gaps = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class ProjectionState(models.Model):
+    """One key (an event or a user) of a projection's state."""
+    projection = models.CharField(max_length=50)
+    key = models.CharField(max_length=50)
+    value = models.JSONField(default=dict)
+
+    class Meta:
+        unique_together = ('projection', 'key')
+
+    def __str__(self):
+        return f"{self.projection}[{self.key}]"
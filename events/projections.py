@@ -0,0 +1,173 @@
+"""Derived views rebuilt from the booking log.
+
+Each projection keeps one ``ProjectionState`` row per key it tracks (an event
+or a user) and the id of the last log entry it consumed in a
+``ProjectionCheckpoint`` row, so a batch only reads and writes the keys its
+entries touch. ``catch_up`` applies only the entries after that checkpoint;
+``rebuild`` starts from an empty state and replays the whole log. Projections
+only add and subtract, so entries may be applied out of id order.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BookingLog, ProjectionCheckpoint, ProjectionState
+
+
+# Ids are handed out before commit, so a slow transaction can commit an entry
+# below a checkpoint that has already moved on. Missing ids below the
+# checkpoint are remembered as gaps and picked up when they appear; ids from
+# rolled-back transactions never do, so a gap is dropped once it has stayed
+# empty for this long after it was first seen.
+GAP_TIMEOUT = timedelta(minutes=30)
+
+
+class Projection:
+    name = None
+
+    def keys(self, entry):
+        raise NotImplementedError
+
+    def apply(self, state, entry):
+        raise NotImplementedError
+
+    def _checkpoint(self):
+        checkpoint, _ = ProjectionCheckpoint.objects.select_for_update().get_or_create(name=self.name)
+        return checkpoint
+
+    def state(self):
+        return dict(ProjectionState.objects.filter(projection=self.name).values_list('key', 'value'))
+
+    def _apply_batch(self, entries):
+        keys = {key for entry in entries for key in self.keys(entry)}
+        rows = {
+            row.key: row
+            for row in ProjectionState.objects.select_for_update().filter(projection=self.name, key__in=keys)
+        }
+        state = {key: row.value for key, row in rows.items()}
+        for entry in entries:
+            self.apply(state, entry)
+
+        for key, row in rows.items():
+            row.value = state[key]
+        ProjectionState.objects.bulk_update(rows.values(), ['value'])
+        ProjectionState.objects.bulk_create([
+            ProjectionState(projection=self.name, key=key, value=value)
+            for key, value in state.items() if key not in rows
+        ])
+
+    def catch_up(self, batch_size=1000):
+        """Apply log entries written since the last checkpoint; returns how many."""
+        applied = self._fill_gaps()
+        while True:
+            with transaction.atomic():
+                checkpoint = self._checkpoint()
+                entries = list(BookingLog.objects.filter(id__gt=checkpoint.position)[:batch_size])
+                if not entries:
+                    return applied
+                seen = timezone.now().isoformat()
+                expected = checkpoint.position + 1
+                for entry in entries:
+                    for missing in range(expected, entry.id):
+                        checkpoint.gaps[str(missing)] = seen
+                    expected = entry.id + 1
+                self._apply_batch(entries)
+                checkpoint.position = entries[-1].id
+                checkpoint.save()
+            applied += len(entries)
+
+    def _fill_gaps(self):
+        with transaction.atomic():
+            checkpoint = self._checkpoint()
+            if not checkpoint.gaps:
+                return 0
+            late = list(BookingLog.objects.filter(id__in=[int(entry_id) for entry_id in checkpoint.gaps]))
+            self._apply_batch(late)
+            for entry in late:
+                del checkpoint.gaps[str(entry.id)]
+            expired = timezone.now() - GAP_TIMEOUT
+            checkpoint.gaps = {
+                entry_id: seen for entry_id, seen in checkpoint.gaps.items()
+                if datetime.fromisoformat(seen) > expired
+            }
+            checkpoint.save()
+        return len(late)
+
+    def rebuild(self, batch_size=1000):
+        with transaction.atomic():
+            checkpoint = self._checkpoint()
+            checkpoint.position = 0
+            checkpoint.gaps = {}
+            checkpoint.save()
+            ProjectionState.objects.filter(projection=self.name).delete()
+        return self.catch_up(batch_size)
+
+
+def _add_amount(bucket, key, amount):
+    bucket[key] = str(Decimal(bucket.get(key, '0')) + amount)
+
+
+# CREATED/TICKETS_ADDED add to the booking, REJECTED/REMOVED take it away and
+# APPROVED only moves it between statuses.
+ADDING_KINDS = (BookingLog.CREATED, BookingLog.TICKETS_ADDED)
+REMOVING_KINDS = (BookingLog.REJECTED, BookingLog.REMOVED)
+
+
+def _sign(entry):
+    if entry.kind in ADDING_KINDS:
+        return 1
+    if entry.kind in REMOVING_KINDS:
+        return -1
+    return 0
+
+
+class SeatCounts(Projection):
+    """Booked tickets per event, as ``Event.booked_seats`` counts them."""
+    name = 'seat_counts'
+
+    def keys(self, entry):
+        return [str(entry.event_id)]
+
+    def apply(self, state, entry):
+        key = str(entry.event_id)
+        state[key] = state.get(key, 0) + _sign(entry) * entry.tickets
+
+
+class UserTotals(Projection):
+    """Tickets held and amount owed per user."""
+    name = 'user_totals'
+
+    def keys(self, entry):
+        return [str(entry.user_id)]
+
+    def apply(self, state, entry):
+        sign = _sign(entry)
+        if not sign:
+            return
+        totals = state.setdefault(str(entry.user_id), {'tickets': 0, 'amount': '0'})
+        totals['tickets'] += sign * entry.tickets
+        _add_amount(totals, 'amount', sign * entry.amount)
+
+
+class SalesStats(Projection):
+    """Tickets and revenue per event, split by registration status."""
+    name = 'sales_stats'
+
+    def keys(self, entry):
+        return [str(entry.event_id)]
+
+    def apply(self, state, entry):
+        stats = state.setdefault(str(entry.event_id), {})
+        if entry.kind == BookingLog.APPROVED:
+            moves = [(entry.status, -1), ('complete', 1)]
+        else:
+            moves = [(entry.status, _sign(entry))]
+        for status, sign in moves:
+            bucket = stats.setdefault(status, {'tickets': 0, 'amount': '0'})
+            bucket['tickets'] += sign * entry.tickets
+            _add_amount(bucket, 'amount', sign * entry.amount)
+
+
+PROJECTIONS = {projection.name: projection for projection in (SeatCounts(), UserTotals(), SalesStats())}
@@ -0,0 +1,112 @@
+import base64
+
+from django.db import transaction
+
+from .models import SeatRow
+
+
+def _block(start, count):
+    return ((1 << count) - 1) << start
+
+
+def _run_starts(free, count):
+    # Bit i of the result is set when seats i .. i+count-1 are all free.
+    starts = free
+    for shift in range(1, count):
+        starts &= free >> shift
+    return starts
+
+
+def _nearest_start(starts, target):
+    # Closest set bit to ``target`` without walking every candidate.
+    best = None
+    upper = starts >> target
+    if upper:
+        best = target + (upper & -upper).bit_length() - 1
+    lower = starts & ((1 << (target + 1)) - 1)
+    if lower:
+        low = lower.bit_length() - 1
+        if best is None or target - low <= best - target:
+            best = low
+    return best
+
+
+def best_available(rows, count, ignore=None):
+    """Return ``(row, start)`` for the best block of ``count`` adjacent free seats.
+
+    Rows are tried in the order given (``SeatRow`` ordering puts the best rows
+    first) and, inside a row, the block closest to the centre wins. ``ignore``
+    maps a row id to a mask of seats to treat as free, used when a
+    registration is moved to a bigger block.
+    """
+    if count < 1:
+        return None
+    for row in rows:
+        if count > row.seat_count:
+            continue
+        taken = row.taken_mask
+        if ignore and row.id in ignore:
+            taken &= ~ignore[row.id]
+        starts = _run_starts(row.full_mask & ~taken, count)
+        if starts:
+            return row, _nearest_start(starts, (row.seat_count - count) // 2)
+    return None
+
+
+def claim_seats(registration, count):
+    """Claim ``count`` adjacent seats for ``registration``.
+
+    Seats the registration already holds are given up for the new block, so
+    this also handles ticket top-ups. The seat rows are updated atomically;
+    the caller saves the registration. Returns ``False`` when no block fits.
+    """
+    with transaction.atomic():
+        rows = list(SeatRow.objects.select_for_update().filter(event_id=registration.event_id))
+        ignore = {}
+        if registration.seat_row_id is not None and registration.seat_start is not None:
+            ignore[registration.seat_row_id] = _block(registration.seat_start, registration.tickets_booked)
+
+        pick = best_available(rows, count, ignore)
+        if pick is None:
+            return False
+
+        row, start = pick
+        for old in rows:
+            if old.id in ignore:
+                old.taken_mask = old.taken_mask & ~ignore[old.id]
+                if old is not row:
+                    old.save(update_fields=['taken'])
+        row.taken_mask = row.taken_mask | _block(start, count)
+        row.save(update_fields=['taken'])
+
+    registration.seat_row = row
+    registration.seat_start = start
+    return True
+
+
+def release_seats(registration):
+    """Free the seats held by ``registration``; the caller saves it."""
+    if registration.seat_row_id is None or registration.seat_start is None:
+        return
+    with transaction.atomic():
+        row = SeatRow.objects.select_for_update().filter(pk=registration.seat_row_id).first()
+        if row is not None:
+            row.taken_mask = row.taken_mask & ~_block(registration.seat_start, registration.tickets_booked)
+            row.save(update_fields=['taken'])
+    registration.seat_row = None
+    registration.seat_start = None
+
+
+def encode_seat_map(event):
+    """Compact seat map for the browser: one entry per row, taken seats as base64."""
+    rows = []
+    for row in event.seat_rows.all():
+        rows.append({
+            'section': row.section,
+            'row': row.label,
+            'first': row.first_seat_number,
+            'seats': row.seat_count,
+            'price': str(row.effective_price),
+            'taken': base64.b64encode(row.taken_mask.to_bytes((row.seat_count + 7) // 8, 'little')).decode(),
+        })
+    return {'event': event.id, 'rows': rows}
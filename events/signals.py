@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import BookingLog, Event, Registration
+from . import seating, wallet
+
+
+# Deletes are invalidated where they happen (views, admin) rather than through
+# post_delete, which would stop Django from fast-deleting registrations.
+
+@receiver(post_save, sender=Registration)
+def registration_saved(sender, instance, **kwargs):
+    wallet.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=Event)
+def event_saved(sender, instance, created, **kwargs):
+    if created:
+        return
+    wallet.events_changed()
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance, **kwargs):
+    # The registrations go with the user through the cascade; free their seats
+    # and log them first.
+    registrations = list(Registration.objects.filter(user=instance))
+    for reg in registrations:
+        seating.release_seats(reg)
+    BookingLog.objects.bulk_create([BookingLog.entry(BookingLog.REMOVED, reg) for reg in registrations])
@@ -1,3 +1,367 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.forms import inlineformset_factory
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .forms import SeatRowForm, SeatRowFormSet
+from .models import BookingLog, Event, ProjectionCheckpoint, ProjectionState, Registration, SeatRow
+from .projections import PROJECTIONS
+from . import seating, wallet
+from .seating import _nearest_start, _run_starts
+
+
+def make_event(**kwargs):
+    defaults = {
+        'title': 'Film Night',
+        'description': 'Screening',
+        'venue': 'Auditorium',
+        'date_time': timezone.now() + timedelta(days=7),
+        'total_seats': 100,
+        'ticket_price': 100,
+    }
+    defaults.update(kwargs)
+    return Event.objects.create(**defaults)
+
+
+def make_registration(user, event, tickets=1, **kwargs):
+    reg = Registration.objects.create(
+        user=user, event=event, tickets_booked=tickets, total_price=tickets * event.ticket_price,
+        transaction_id=f"TX-{Registration.objects.count()}", **kwargs
+    )
+    BookingLog.record(BookingLog.CREATED, reg)
+    return reg
+
+
+class SeatBitsTests(TestCase):
+    def test_run_starts_marks_blocks_of_free_seats(self):
+        # Seats 0-2 and 4-6 are free, seat 3 is taken.
+        self.assertEqual(_run_starts(0b1110111, 3), 0b10001)
+        self.assertEqual(_run_starts(0b1110111, 4), 0)
+
+    def test_nearest_start_prefers_the_closest_then_the_lower_block(self):
+        self.assertEqual(_nearest_start(0b10001, 3), 4)
+        self.assertEqual(_nearest_start(0b10001, 2), 0)
+        self.assertEqual(_nearest_start(0b1, 5), 0)
+
+    def test_best_available_skips_full_rows_and_centres_the_block(self):
+        full = SeatRow(id=1, seat_count=10)
+        full.taken_mask = full.full_mask
+        empty = SeatRow(id=2, seat_count=10)
+        self.assertEqual(seating.best_available([full, empty], 4), (empty, 3))
+        self.assertIsNone(seating.best_available([full], 1))
+
+    def test_best_available_is_under_a_millisecond_on_20000_seats(self):
+        rows = [SeatRow(id=i, seat_count=100) for i in range(200)]
+        for row in rows[:-1]:
+            row.taken_mask = row.full_mask
+        rows[-1].taken_mask = 0b1011
+
+        runs = 200
+        started = time.perf_counter()
+        for _ in range(runs):
+            self.assertIsNotNone(seating.best_available(rows, 4))
+        self.assertLess((time.perf_counter() - started) / runs, 0.001)
+
+
+class SeatClaimTests(TestCase):
+    def setUp(self):
+        self.event = make_event()
+        self.row = SeatRow.objects.create(event=self.event, section='Main', label='A', seat_count=6)
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+
+    def claim(self, user, tickets):
+        reg = Registration(user=user, event=self.event, tickets_booked=tickets, transaction_id=f"TX-{user.pk}")
+        self.assertTrue(seating.claim_seats(reg, tickets))
+        reg.save()
+        return reg
+
+    def taken(self):
+        self.row.refresh_from_db()
+        return self.row.taken_mask
+
+    def test_top_up_moves_the_block_and_release_frees_it(self):
+        alice = self.claim(self.alice, 2)
+        self.assertEqual(alice.seat_start, 2)
+        self.claim(self.bob, 2)
+        self.assertEqual(self.taken(), 0b001111)
+
+        # Alice's own seats count as free when she moves to a bigger block.
+        self.assertTrue(seating.claim_seats(alice, 3))
+        alice.tickets_booked = 3
+        alice.save()
+        self.assertEqual(alice.seat_start, 2)
+        self.assertEqual(self.taken(), 0b011111)
+        self.assertEqual(alice.seat_labels, "Main, row A, seats 3-5")
+
+        seating.release_seats(alice)
+        alice.save()
+        self.assertEqual(self.taken(), 0b000011)
+        self.assertIsNone(alice.seat_row)
+
+    def test_claim_fails_without_a_block_and_leaves_the_map_alone(self):
+        self.claim(self.alice, 4)
+        reg = Registration(user=self.bob, event=self.event, tickets_booked=3)
+        self.assertFalse(seating.claim_seats(reg, 3))
+        self.assertEqual(self.taken(), 0b011110)
+
+    def test_deleting_a_user_releases_their_seats(self):
+        self.claim(self.alice, 2)
+        self.alice.delete()
+        self.assertEqual(self.taken(), 0)
+
+    def test_row_cannot_shrink_below_a_claimed_seat(self):
+        self.claim(self.alice, 4)
+        self.assertEqual(self.taken(), 0b011110)
+        data = {'section': 'Main', 'label': 'A', 'first_seat_number': 1, 'rank': 0}
+        self.assertFalse(SeatRowForm({**data, 'seat_count': 4}, instance=self.row).is_valid())
+        self.assertTrue(SeatRowForm({**data, 'seat_count': 5}, instance=self.row).is_valid())
+
+    def test_inline_formset_refuses_to_delete_a_row_with_claimed_seats(self):
+        self.claim(self.alice, 2)
+        empty = SeatRow.objects.create(event=self.event, section='Main', label='B', seat_count=6)
+        FormSet = inlineformset_factory(Event, SeatRow, form=SeatRowForm, formset=SeatRowFormSet, can_delete=True)
+        data = {'seat_rows-TOTAL_FORMS': 2, 'seat_rows-INITIAL_FORMS': 2, 'seat_rows-MIN_NUM_FORMS': 0}
+        for i, row in enumerate([self.row, empty]):
+            data.update({
+                f'seat_rows-{i}-id': row.pk, f'seat_rows-{i}-section': row.section, f'seat_rows-{i}-label': row.label,
+                f'seat_rows-{i}-seat_count': row.seat_count, f'seat_rows-{i}-first_seat_number': 1,
+                f'seat_rows-{i}-rank': 0,
+            })
+
+        claimed = FormSet({**data, 'seat_rows-0-DELETE': 'on'}, instance=self.event, prefix='seat_rows')
+        self.assertFalse(claimed.is_valid())
+        unclaimed = FormSet({**data, 'seat_rows-1-DELETE': 'on'}, instance=self.event, prefix='seat_rows')
+        self.assertTrue(unclaimed.is_valid())
+        unclaimed.save()
+        self.assertEqual(list(self.event.seat_rows.all()), [self.row])
+
+    def test_admin_locks_event_and_user_of_a_seated_registration(self):
+        reg = self.claim(self.alice, 2)
+        self.client.force_login(User.objects.create_superuser('admin'))
+        page = self.client.get(f'/admin/events/registration/{reg.pk}/change/').content
+        for field in (b'name="event"', b'name="user"', b'name="tickets_booked"'):
+            self.assertNotIn(field, page)
+
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class WalletTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('alice')
+        self.events = [make_event(title=f'Event {i}') for i in range(5)]
+        for event in self.events:
+            make_registration(self.user, event, 2)
+
+    def test_dashboard_does_not_query_per_registration(self):
+        self.client.force_login(self.user)
+        # Session, user and the single wallet query.
+        with self.assertNumQueries(3):
+            response = self.client.get('/dashboard/')
+        self.assertContains(response, 'Event 4')
+        # Served from the cache after that.
+        with self.assertNumQueries(2):
+            self.client.get('/dashboard/')
+
+    def test_json_endpoint(self):
+        self.client.force_login(self.user)
+        data = self.client.get('/dashboard/wallet/').json()
+        self.assertEqual(data['totals']['registrations'], 5)
+        self.assertEqual(data['totals']['tickets'], 10)
+        self.assertEqual(data['tickets'][0]['status'], 'pending')
+
+        self.client.force_login(User.objects.create_superuser('admin'))
+        self.assertEqual(self.client.get('/dashboard/wallet/').status_code, 403)
+
+    def test_registration_save_and_reject_invalidate_on_commit(self):
+        reg = Registration.objects.filter(user=self.user).first()
+        self.assertEqual(wallet.get_wallet(self.user)['totals']['complete'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reg.status = 'complete'
+            reg.save()
+        self.assertEqual(wallet.get_wallet(self.user)['totals']['complete'], 1)
+
+        self.client.force_login(User.objects.create_superuser('admin'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/admin_access/registrations/{reg.pk}/reject/')
+        self.assertEqual(wallet.get_wallet(self.user)['totals']['registrations'], 4)
+
+    def test_wallet_built_before_a_commit_is_not_served_after_it(self):
+        # A reader takes its key and snapshot, then a change commits before
+        # the reader's cache.set runs.
+        key = wallet._cache_key(self.user.id)
+        stale = wallet._build(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_registration(self.user, make_event(title='Late'), 1)
+        cache.set(key, stale)
+
+        self.assertEqual(wallet.get_wallet(self.user)['totals']['registrations'], 6)
+
+
+class CancellationTests(TestCase):
+    def setUp(self):
+        self.event = make_event()
+        self.other = make_event(title='Photo Walk')
+        self.user = User.objects.create_user('alice')
+        self.admin = User.objects.create_superuser('admin')
+
+    def test_admin_delete_only_cancels_the_event(self):
+        make_registration(self.user, self.event, 2)
+        self.client.force_login(self.admin)
+        self.client.get(f'/dashboard/event/{self.event.pk}/delete/')
+
+        self.event.refresh_from_db()
+        self.assertTrue(self.event.is_cancelled)
+        self.assertEqual(Registration.objects.filter(event=self.event).count(), 1)
+        self.assertEqual(self.client.get(f'/event/{self.event.pk}/').status_code, 404)
+
+    def test_django_admin_delete_only_cancels_the_event(self):
+        self.client.force_login(self.admin)
+        self.assertContains(self.client.get(f'/admin/events/event/{self.event.pk}/delete/'), 'Yes, cancel the event')
+        response = self.client.post(f'/admin/events/event/{self.event.pk}/delete/', {'post': 'yes'}, follow=True)
+        self.assertContains(response, 'was cancelled')
+        self.assertNotContains(response, 'deleted successfully')
+        self.event.refresh_from_db()
+        self.assertTrue(self.event.is_cancelled)
+
+        response = self.client.post('/admin/events/event/', {
+            'action': 'cancel_selected', '_selected_action': [self.other.pk],
+        }, follow=True)
+        self.assertContains(response, 'Cancelled 1 event(s)')
+        self.other.refresh_from_db()
+        self.assertTrue(self.other.is_cancelled)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_wallet_drops_tickets_of_a_cancelled_event(self):
+        make_registration(self.user, self.event, 2, status='complete')
+        make_registration(self.user, self.other, 1)
+        self.assertEqual(wallet.get_wallet(self.user)['totals']['registrations'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.cancelled_at = timezone.now()
+            self.event.save(update_fields=['cancelled_at'])
+
+        tickets = wallet.get_wallet(self.user)['tickets']
+        self.assertEqual([t['event_id'] for t in tickets], [self.other.pk])
+
+    def test_interrupted_purge_resumes_without_double_logging(self):
+        users = [User.objects.create_user(f'user{i}') for i in range(5)]
+        for user in users:
+            make_registration(user, self.event, 2)
+        make_registration(self.user, self.other, 1)
+        self.event.cancelled_at = timezone.now()
+        self.event.save()
+
+        with mock.patch('time.sleep', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('purge_cancelled_events', batch_size=2, pause=1, stdout=StringIO())
+        self.assertEqual(Registration.objects.filter(event=self.event).count(), 3)
+
+        call_command('purge_cancelled_events', batch_size=2, stdout=StringIO())
+        self.assertFalse(Event.objects.filter(pk=self.event.pk).exists())
+        self.assertEqual(Registration.objects.filter(event=self.other).count(), 1)
+        removed = BookingLog.objects.for_event(self.event.pk).filter(kind=BookingLog.REMOVED)
+        self.assertEqual(removed.count(), 5)
+
+
+class BookingLogProjectionTests(TestCase):
+    def setUp(self):
+        self.event = make_event()
+        self.admin = User.objects.create_superuser('admin')
+        self.alice, self.bob, self.carol, self.dave = (
+            User.objects.create_user(name) for name in ('alice', 'bob', 'carol', 'dave')
+        )
+
+    def book(self, user, tickets):
+        self.client.force_login(user)
+        self.client.post(f'/event/{self.event.pk}/payment/?tickets={tickets}', {
+            'name': user.username, 'student_id': '1', 'phone_number': '1',
+            'transaction_id': f'TX-{user.username}', 'payment_method': 'bkash',
+        })
+        return Registration.objects.get(user=user)
+
+    def make_history(self):
+        alice = self.book(self.alice, 2)
+        self.client.post(f'/event/{self.event.pk}/register/', {'tickets': 1})
+        bob = self.book(self.bob, 3)
+        self.book(self.dave, 1)
+
+        self.client.force_login(self.admin)
+        form = {
+            'user': self.carol.pk, 'event': self.event.pk, 'name': 'carol', 'transaction_id': 'TX-carol',
+            'payment_method': 'bkash', 'tickets_booked': 1, 'total_price': '100', 'status': 'pending',
+            'tracking_code': 'TKT-CAROL',
+        }
+        self.client.post('/admin/events/registration/add/', form)
+        carol = Registration.objects.get(user=self.carol)
+        self.client.post(f'/admin/events/registration/{carol.pk}/change/', {**form, 'tickets_booked': 2})
+        self.client.post(f'/admin_access/registrations/{alice.pk}/approve/')
+        self.client.post(f'/admin_access/registrations/{bob.pk}/reject/')
+        self.dave.delete()
+
+    def table_seat_count(self):
+        return sum(reg.tickets_booked for reg in Registration.objects.filter(event=self.event))
+
+    def test_replay_matches_the_tables(self):
+        self.make_history()
+        call_command('replay_booking_log', '--rebuild', stdout=StringIO())
+
+        self.assertEqual(self.table_seat_count(), 5)
+        self.assertEqual(self.event.booked_seats(), 5)
+        self.assertEqual(PROJECTIONS['seat_counts'].state(), {str(self.event.pk): 5})
+
+        user_totals = PROJECTIONS['user_totals'].state()
+        for reg in Registration.objects.all():
+            self.assertEqual(user_totals[str(reg.user_id)], {'tickets': reg.tickets_booked, 'amount': str(reg.total_price)})
+        self.assertEqual(user_totals[str(self.bob.pk)]['tickets'], 0)
+        self.assertEqual(ProjectionState.objects.filter(projection='user_totals').count(), 4)
+
+        alice = Registration.objects.get(user=self.alice)
+        sales = PROJECTIONS['sales_stats'].state()[str(self.event.pk)]
+        self.assertEqual(sales['complete'], {'tickets': 3, 'amount': str(alice.total_price)})
+        self.assertEqual(sales['pending']['tickets'], 2)
+
+    def test_catch_up_applies_entries_that_commit_late(self):
+        def log(entry_id, tickets):
+            BookingLog.objects.create(
+                id=entry_id, kind=BookingLog.CREATED, registration_id=entry_id,
+                event_id=self.event.pk, user_id=self.alice.pk, status='pending', tickets=tickets,
+            )
+
+        seat_counts = PROJECTIONS['seat_counts']
+        log(1, 1)
+        log(3, 2)
+        self.assertEqual(seat_counts.catch_up(), 2)
+        self.assertEqual(list(ProjectionCheckpoint.objects.get(name='seat_counts').gaps), ['2'])
+        self.assertEqual(seat_counts.state(), {str(self.event.pk): 3})
+
+        log(2, 4)
+        other = make_event(title='Untouched')
+        ProjectionState.objects.create(projection='seat_counts', key=str(other.pk), value=9)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(seat_counts.catch_up(), 1)
+        # Only the key the late entry belongs to is read and written back.
+        self.assertFalse(any(f"'{other.pk}'" in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(seat_counts.state(), {str(self.event.pk): 7, str(other.pk): 9})
+        self.assertEqual(ProjectionCheckpoint.objects.get(name='seat_counts').gaps, {})
+
+    def test_log_is_append_only(self):
+        make_registration(self.alice, self.event)
+        entry = BookingLog.objects.get()
+        with self.assertRaises(ValueError):
+            entry.save()
+        with self.assertRaises(ValueError):
+            entry.delete()
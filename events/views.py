@@ -2,20 +2,23 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import JsonResponse
 from django.utils import timezone
 from django.db.models import Count, Q
-from .models import Event, Registration, PaymentMethod
+from .models import Event, Registration, PaymentMethod, BookingLog
 from .forms import EventForm, PaymentMethodForm
+from . import seating, wallet
 
 
 # -------------------- Public/User Views --------------------
 
 def event_list(request):
-    events = Event.objects.all()
+    events = Event.objects.filter(cancelled_at__isnull=True)
     return render(request, 'events/event_list.html', {'events': events})
 
 def event_detail(request, pk):
-    event = get_object_or_404(Event, pk=pk)
+    event = get_object_or_404(Event, pk=pk, cancelled_at__isnull=True)
     event_past = event.date_time < timezone.now()
 
     # If user is not logged in, show message but allow page view
@@ -46,7 +49,7 @@ def event_detail(request, pk):
 
 @login_required(login_url='/')
 def register_event(request, pk):
-    event = get_object_or_404(Event, pk=pk)
+    event = get_object_or_404(Event, pk=pk, cancelled_at__isnull=True)
 
     # Superuser cannot register
     if request.user.is_superuser:
@@ -70,18 +73,29 @@ def register_event(request, pk):
             messages.warning(request, "Already booked tickets. Max 4 per user.")
         else:
             if event.remaining_seats >= tickets_requested:
-                registration.tickets_booked = total_tickets
-                registration.save()
+                with transaction.atomic():
+                    if event.seat_rows.exists() and not seating.claim_seats(registration, total_tickets):
+                        messages.error(request, "Not enough seats available together.")
+                        return redirect('event_detail', pk=pk)
+                    registration.tickets_booked = total_tickets
+                    registration.save()
+                    BookingLog.record(BookingLog.TICKETS_ADDED, registration, tickets=tickets_requested, amount=0)
                 messages.success(request, f"Added {tickets_requested} more tickets. Total: {total_tickets}")
             else:
                 messages.error(request, "Not enough seats available.")
     else:
         if event.remaining_seats >= tickets_requested:
-            Registration.objects.create(
+            registration = Registration(
                 user=request.user,
                 event=event,
                 tickets_booked=tickets_requested
             )
+            with transaction.atomic():
+                if event.seat_rows.exists() and not seating.claim_seats(registration, tickets_requested):
+                    messages.error(request, "Not enough seats available together.")
+                    return redirect('event_detail', pk=pk)
+                registration.save()
+                BookingLog.record(BookingLog.CREATED, registration)
             messages.success(request, f"Successfully booked {tickets_requested} tickets!")
         else:
             messages.error(request, "Not enough seats available.")
@@ -90,7 +104,7 @@ def register_event(request, pk):
 
 @login_required(login_url='/')
 def payment_page(request, pk):
-    event = get_object_or_404(Event, pk=pk)
+    event = get_object_or_404(Event, pk=pk, cancelled_at__isnull=True)
 
     # Superuser cannot pay
     if request.user.is_superuser:
@@ -104,6 +118,14 @@ def payment_page(request, pk):
     tickets_requested = int(request.GET.get('tickets', 1))
     total_price = tickets_requested * event.ticket_price
 
+    has_seat_map = event.seat_rows.exists()
+    if has_seat_map:
+        best = seating.best_available(event.seat_rows.all(), tickets_requested)
+        if best is None:
+            messages.error(request, "Not enough seats available together.")
+            return redirect('event_detail', pk=pk)
+        total_price = tickets_requested * best[0].effective_price
+
     if request.method == 'POST':
         name = request.POST.get('name')
         student_id = request.POST.get('student_id')
@@ -116,7 +138,7 @@ def payment_page(request, pk):
             messages.warning(request, "Maximum number of tickets (4) exceeded.")
             return redirect('user_dashboard')
 
-        Registration.objects.create(
+        registration = Registration(
             user=request.user,
             event=event,
             name=name,
@@ -128,6 +150,14 @@ def payment_page(request, pk):
             total_price=total_price,
             status='pending'
         )
+        with transaction.atomic():
+            if has_seat_map:
+                if not seating.claim_seats(registration, tickets_requested):
+                    messages.error(request, "Those seats were just taken. Please try again.")
+                    return redirect('event_detail', pk=pk)
+                registration.total_price = tickets_requested * registration.seat_row.effective_price
+            registration.save()
+            BookingLog.record(BookingLog.CREATED, registration)
         messages.info(request, f"Submitted {tickets_requested} tickets. Awaiting admin approval.")
         return redirect('user_dashboard')
     
@@ -138,16 +168,21 @@ def payment_page(request, pk):
         'tickets_requested': tickets_requested,
         'total_price': total_price,
         'payment_methods': payment_methods,
-
+        'seat_preview': best[0].seat_labels(best[1], tickets_requested) if has_seat_map else '',
     })
 
+def event_seat_map(request, pk):
+    event = get_object_or_404(Event, pk=pk, cancelled_at__isnull=True)
+    return JsonResponse(seating.encode_seat_map(event))
+
 @login_required(login_url='/')
 def ticket_view(request, tracking_code):
     reg = get_object_or_404(
         Registration,
         tracking_code=tracking_code,
         user=request.user,
-        status='complete'
+        status='complete',
+        event__cancelled_at__isnull=True
     )
 
     return render(request, 'tickets/boarding_pass.html', {
@@ -180,8 +215,12 @@ def admin_dashboard(request):
     events = Event.objects.annotate(
         approved_count=Count('registration', filter=Q(registration__status='complete'))
     ).order_by('-date_time')
-    pending_regs = Registration.objects.filter(status='pending').select_related('event', 'user')
-    approved_regs = Registration.objects.filter(status='complete').select_related('event', 'user')
+    pending_regs = Registration.objects.filter(
+        status='pending', event__cancelled_at__isnull=True
+    ).select_related('event', 'user')
+    approved_regs = Registration.objects.filter(
+        status='complete', event__cancelled_at__isnull=True
+    ).select_related('event', 'user')
     return render(request, 'admin_access/dashboard.html', {
         'events': events,
         'pending_regs': pending_regs,
@@ -209,9 +248,12 @@ def admin_approve_registration(request, reg_id):
         messages.error(request, "You do not have permission.")
         return redirect('event_list')
 
-    reg = get_object_or_404(Registration, id=reg_id)
-    reg.status = 'complete'
-    reg.save()
+    with transaction.atomic():
+        reg = get_object_or_404(Registration.objects.select_for_update(), id=reg_id)
+        if reg.status != 'complete':
+            BookingLog.record(BookingLog.APPROVED, reg)
+            reg.status = 'complete'
+            reg.save()
     messages.success(request, f"Approved registration for {reg.user.username} ({reg.event.title})")
     return redirect('admin_dashboard')
 
@@ -221,7 +263,11 @@ def admin_reject_registration(request, reg_id):
         return redirect('event_list')
 
     reg = get_object_or_404(Registration, id=reg_id)
-    reg.delete()
+    with transaction.atomic():
+        seating.release_seats(reg)
+        BookingLog.record(BookingLog.REJECTED, reg)
+        reg.delete()
+    wallet.invalidate(reg.user_id)
     messages.warning(request, f"Rejected registration for {reg.user.username} ({reg.event.title})")
     return redirect('admin_dashboard')
 
@@ -245,15 +291,21 @@ def user_dashboard(request):
     if request.user.is_superuser:
         return redirect('admin_dashboard')
 
-    registrations = Registration.objects.filter(user=request.user).select_related('event')
-    return render(request, 'events/user_dashboard.html', {'registrations': registrations})
+    return render(request, 'events/user_dashboard.html', {'wallet': wallet.get_wallet(request.user)})
+
+@login_required(login_url='/')
+def user_wallet(request):
+    if request.user.is_superuser:
+        return JsonResponse({'error': 'Superusers do not have a ticket wallet.'}, status=403)
+
+    return JsonResponse(wallet.get_wallet(request.user))
 
 def admin_edit_event(request, pk):
     if not request.user.is_authenticated or not request.user.is_superuser:
         messages.error(request, "You do not have permission.")
         return redirect('event_list')
 
-    event = get_object_or_404(Event, pk=pk)
+    event = get_object_or_404(Event, pk=pk, cancelled_at__isnull=True)
 
     if request.method == 'POST':
         form = EventForm(request.POST, instance=event)
@@ -274,9 +326,12 @@ def admin_delete_event(request, pk):
         messages.error(request, "You do not have permission.")
         return redirect('event_list')
 
-    event = get_object_or_404(Event, pk=pk)
-    event.delete()
-    messages.warning(request, "Event deleted successfully.")
+    # Only hide the event and stop sales here; registrations are removed in
+    # batches by the purge_cancelled_events management command.
+    event = get_object_or_404(Event, pk=pk, cancelled_at__isnull=True)
+    event.cancelled_at = timezone.now()
+    event.save(update_fields=['cancelled_at'])
+    messages.warning(request, "Event cancelled. Its registrations will be removed in the background.")
     return redirect('admin_dashboard')
 
 @login_required(login_url='/')
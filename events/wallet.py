@@ -0,0 +1,87 @@
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Registration
+
+CACHE_TIMEOUT = 60 * 60
+EVENTS_VERSION_KEY = 'wallet:events-version'
+
+
+def _generation_key(user_id):
+    return f"wallet:{user_id}:generation"
+
+
+def _token(key):
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        token = cache.get(key)
+    return token
+
+
+def _cache_key(user_id):
+    # Wallets embed event details, so an event edit swaps the shared token and
+    # every cached wallet misses instead of deleting each attendee's key. The
+    # per-user generation is read before the wallet is built; if a change
+    # commits in between, invalidate() swaps it and the late cache.set lands
+    # under a key nobody reads any more.
+    return f"wallet:{user_id}:{_token(EVENTS_VERSION_KEY)}:{_token(_generation_key(user_id))}"
+
+
+def _build(user_id):
+    registrations = (
+        Registration.objects.filter(user_id=user_id, event__cancelled_at__isnull=True)
+        .select_related('event', 'seat_row')
+        .only(
+            'status', 'tickets_booked', 'total_price', 'tracking_code', 'registered_at', 'seat_start',
+            'event__title', 'event__venue', 'event__date_time',
+            'seat_row__section', 'seat_row__label', 'seat_row__first_seat_number',
+        )
+        .order_by('-registered_at')
+    )
+
+    tickets = []
+    totals = {'registrations': 0, 'tickets': 0, 'pending': 0, 'complete': 0, 'amount': 0}
+    for reg in registrations:
+        tickets.append({
+            'id': reg.id,
+            'event_id': reg.event_id,
+            'event_title': reg.event.title,
+            'event_venue': reg.event.venue,
+            'event_date': reg.event.date_time,
+            'tickets': reg.tickets_booked,
+            'total_price': reg.total_price,
+            'status': reg.status,
+            'tracking_code': reg.tracking_code,
+            'seats': reg.seat_labels,
+        })
+        totals['registrations'] += 1
+        totals['tickets'] += reg.tickets_booked
+        totals['amount'] += reg.total_price
+        if reg.status in totals:
+            totals[reg.status] += 1
+    return {'tickets': tickets, 'totals': totals}
+
+
+def get_wallet(user):
+    """Projected summary of a user's registrations, cached until they change."""
+    key = _cache_key(user.id)
+    wallet = cache.get(key)
+    if wallet is None:
+        wallet = _build(user.id)
+        cache.set(key, wallet, CACHE_TIMEOUT)
+    return wallet
+
+
+def invalidate(*user_ids):
+    """Drop the cached wallets once the current transaction commits."""
+    if user_ids:
+        transaction.on_commit(lambda: cache.set_many(
+            {_generation_key(user_id): uuid.uuid4().hex for user_id in user_ids}, None
+        ))
+
+
+def events_changed():
+    transaction.on_commit(lambda: cache.set(EVENTS_VERSION_KEY, uuid.uuid4().hex, None))